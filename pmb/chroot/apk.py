@@ -14,15 +14,22 @@ import pmb.parse.depends
 import pmb.parse.version
 
 
-def update_repository_list(args, suffix="native", check=False):
+def repository_list(args):
+    """
+    Get the lines for /etc/apk/repositories. The mirror arguments don't change
+    during one pmbootstrap call, so the result of pmb.helpers.repo.urls() is
+    cached for all chroots.
+    """
+    key = (args.mirror_alpine, tuple(args.mirrors_postmarketos))
+    if key not in pmb.helpers.other.cache["repo_urls"]:
+        pmb.helpers.other.cache["repo_urls"][key] = pmb.helpers.repo.urls(args)
+    return pmb.helpers.other.cache["repo_urls"][key]
+
+
+def update_repository_list(args, suffix="native"):
     """
     Update /etc/apk/repositories, if it is outdated (when the user changed the
     --mirror-alpine or --mirror-pmOS parameters).
-
-    :param check: This function calls it self after updating the
-                  /etc/apk/repositories file, to check if it was successful.
-                  Only for this purpose, the "check" parameter should be set to
-                  True.
     """
     # Skip if we already did this
     if suffix in pmb.helpers.other.cache["apk_repository_list_updated"]:
@@ -31,33 +38,31 @@ def update_repository_list(args, suffix="native", check=False):
     # Read old entries or create folder structure
     path = f"{args.work}/chroot_{suffix}/etc/apk/repositories"
     lines_old = []
-    if os.path.exists(path):
+    try:
         # Read all old lines
-        lines_old = []
         with open(path) as handle:
-            for line in handle:
-                lines_old.append(line[:-1])
-    else:
+            lines_old = handle.read().splitlines()
+    except FileNotFoundError:
         pmb.helpers.run.root(args, ["mkdir", "-p", os.path.dirname(path)])
 
     # Up to date: Save cache, return
-    lines_new = pmb.helpers.repo.urls(args)
+    lines_new = repository_list(args)
     if lines_old == lines_new:
         pmb.helpers.other.cache["apk_repository_list_updated"].append(suffix)
         return
 
-    # Check phase: raise error when still outdated
-    if check:
-        raise RuntimeError(f"Failed to update: {path}")
-
     # Update the file
     logging.debug(f"({suffix}) update /etc/apk/repositories")
-    if os.path.exists(path):
-        pmb.helpers.run.root(args, ["rm", path])
-    for line in lines_new:
-        pmb.helpers.run.root(args, ["sh", "-c", "echo "
-                                    f"{shlex.quote(line)} >> {path}"])
-    update_repository_list(args, suffix, True)
+    pmb.helpers.other.cache["depends_recurse"].pop(suffix, None)
+    content = "\n".join(lines_new) + "\n"
+    pmb.helpers.run.root(args, ["sh", "-c", f"printf %s {shlex.quote(content)}"
+                                f" > {shlex.quote(path)}"])
+
+    # Check if it was successful
+    with open(path) as handle:
+        if handle.read().splitlines() != lines_new:
+            raise RuntimeError(f"Failed to update: {path}")
+    pmb.helpers.other.cache["apk_repository_list_updated"].append(suffix)
 
 
 def check_min_version(args, suffix="native"):
@@ -87,13 +92,20 @@ def check_min_version(args, suffix="native"):
     pmb.helpers.other.cache["apk_min_version_checked"].append(suffix)
 
 
-def install_is_necessary(args, build, arch, package, packages_installed):
+def install_is_necessary(args, build, arch, package, packages_installed,
+                         data_repo_map=None, build_disabled=False):
     """
     This function optionally builds an out of date package, and checks if the
     version installed inside a chroot is up to date.
     :param build: Set to true to build the package, if the binary packages are
                   out of date, and it is in the aports folder.
     :param packages_installed: Return value from installed().
+    :param data_repo_map: Return value from pmb.parse.apkindex.packages_bulk()
+                          for (at least) this package, to avoid looking it up
+                          again. It must have been created after building
+                          the package.
+    :param build_disabled: the user disabled building packages during
+                           "pmbootstrap install" (see install())
     :returns: True if the package needs to be installed/updated,
               False otherwise.
     """
@@ -101,11 +113,6 @@ def install_is_necessary(args, build, arch, package, packages_installed):
     if package.startswith("!"):
         return package[1:] in packages_installed
 
-    # User may have disabled buiding packages during "pmbootstrap install"
-    build_disabled = False
-    if args.action == "install" and not args.build_pkgs_on_install:
-        build_disabled = True
-
     # Build package
     if build and not build_disabled:
         pmb.build.package(args, package, arch)
@@ -114,9 +121,14 @@ def install_is_necessary(args, build, arch, package, packages_installed):
     if package not in packages_installed:
         return True
 
-    # Make sure that we really have a binary package
-    data_repo = pmb.parse.apkindex.package(args, package, arch, False)
-    if not data_repo:
+    # Make sure that we really have a binary package (rebuild it once if not)
+    for attempt in range(2):
+        if data_repo_map is not None and not attempt:
+            data_repo = data_repo_map[package]
+        else:
+            data_repo = pmb.parse.apkindex.package(args, package, arch, False)
+        if data_repo or attempt:
+            break
         if build_disabled:
             raise RuntimeError(f"{package}: no binary package found for"
                                f" {arch}, and compiling packages during"
@@ -130,8 +142,9 @@ def install_is_necessary(args, build, arch, package, packages_installed):
                         " report this, if there is no ticket about this"
                         " yet!")
         pmb.build.package(args, package, arch, True)
-        return install_is_necessary(args, build, arch, package,
-                                    packages_installed)
+    if not data_repo:
+        raise RuntimeError(f"{package}: no binary package found for {arch},"
+                           " even after rebuilding it.")
 
     # Compare the installed version vs. the version in the repos
     data_installed = packages_installed[package]
@@ -165,8 +178,12 @@ def replace_aports_packages_with_path(args, packages, suffix, arch):
     with the absolute path to the package.
     """
     ret = []
+    pmaports_map = pmb.helpers.pmaports.all_pkgnames(args)
     for package in packages:
-        aport = pmb.helpers.pmaports.find(args, package, False)
+        # Subpackages created with shell loops can only be guessed (see
+        # pmb.helpers.pmaports.find())
+        aport = (pmaports_map.get(package) or
+                 pmb.helpers.pmaports.guess_main(args, package))
         if aport:
             data_repo = pmb.parse.apkindex.package(args, package, arch, False)
             if not data_repo:
@@ -185,6 +202,24 @@ def replace_aports_packages_with_path(args, packages, suffix, arch):
     return ret
 
 
+def depends_recurse(args, packages, suffix="native"):
+    """
+    Cached wrapper around pmb.parse.depends.recurse(). The cache for a suffix
+    gets cleared when the chroot is initialized from scratch, when its
+    /etc/apk/repositories file changes and after packages were (un)installed
+    with install().
+
+    :returns: see pmb.parse.depends.recurse()
+    """
+    cache = pmb.helpers.other.cache["depends_recurse"]
+    if suffix not in cache:
+        cache[suffix] = {}
+    key = frozenset(packages)
+    if key not in cache[suffix]:
+        cache[suffix][key] = pmb.parse.depends.recurse(args, packages, suffix)
+    return cache[suffix][key]
+
+
 def install(args, packages, suffix="native", build=True):
     """
     :param build: automatically build the package, when it does not exist yet
@@ -196,36 +231,60 @@ def install(args, packages, suffix="native", build=True):
     check_min_version(args, suffix)
     pmb.chroot.init(args, suffix)
 
-    # Add depends to packages
+    # Add depends to packages (cached per suffix, see depends_recurse())
     arch = pmb.parse.arch.from_chroot_suffix(args, suffix)
-    packages_with_depends = pmb.parse.depends.recurse(args, packages, suffix)
+    packages_with_depends = depends_recurse(args, packages, suffix)
+
+    # User may have disabled buiding packages during "pmbootstrap install"
+    build_disabled = False
+    if args.action == "install" and not args.build_pkgs_on_install:
+        build_disabled = True
 
-    # Filter outdated packages (build them if required)
+    # Build outdated packages first, so the binary package data that gets
+    # looked up below is up to date
+    if build and not build_disabled:
+        for package in packages_with_depends:
+            if not package.startswith("!"):
+                pmb.build.package(args, package, arch)
+
+    # Filter outdated packages. Missing packages need to be installed in any
+    # case, only compare the versions of the installed ones.
     packages_installed = installed(args, suffix)
+    packages_missing = set(packages_with_depends) - packages_installed.keys()
+    data_repo_map = pmb.parse.apkindex.packages_bulk(
+        args, [p for p in packages_with_depends if p in packages_installed],
+        arch)
     packages_toadd = []
     packages_todel = []
     for package in packages_with_depends:
-        if not install_is_necessary(
-                args, build, arch, package, packages_installed):
-            continue
-        if package.startswith("!"):
-            packages_todel.append(package.lstrip("!"))
+        is_conflict = package.startswith("!")
+        if is_conflict or package not in packages_missing:
+            if not install_is_necessary(args, False, arch, package,
+                                        packages_installed, data_repo_map,
+                                        build_disabled):
+                continue
+        pkgname = package[1:] if is_conflict else package
+
+        # Sanitize packages: don't allow '--allow-untrusted' and other options
+        # to be passed to apk!
+        if pkgname.startswith("-"):
+            raise ValueError(f"Invalid package name: {pkgname}")
+
+        if is_conflict:
+            packages_todel.append(pkgname)
         else:
-            packages_toadd.append(package)
+            packages_toadd.append(pkgname)
     if not len(packages_toadd) and not len(packages_todel):
         return
 
-    # Sanitize packages: don't allow '--allow-untrusted' and other options
-    # to be passed to apk!
-    for package in packages_toadd + packages_todel:
-        if package.startswith("-"):
-            raise ValueError(f"Invalid package name: {package}")
-
-    # Readable install message without dependencies
+    # Readable install message without dependencies, split off conflicts
     message = f"({suffix}) install"
+    packages_without_conflicts = []
     for pkgname in packages:
         if pkgname not in packages_installed:
             message += f" {pkgname}"
+        if not pkgname.startswith("!"):
+            packages_without_conflicts.append(pkgname)
     logging.info(message)
 
     # Local packages: Using the path instead of pkgname makes apk update
@@ -233,10 +292,6 @@ def install(args, packages, suffix="native", build=True):
     packages_toadd = replace_aports_packages_with_path(args, packages_toadd,
                                                        suffix, arch)
 
-    # Split off conflicts
-    packages_without_conflicts = list(
-        filter(lambda p: not p.startswith("!"), packages))
-
     # Use a virtual package to mark only the explicitly requested packages as
     # explicitly installed, not their dependencies or specific paths (#1212)
     commands = [["add"] + packages_without_conflicts]
@@ -247,24 +302,39 @@ def install(args, packages, suffix="native", build=True):
                     ["del", ".pmbootstrap"]]
     if len(packages_todel):
         commands.append(["del"] + packages_todel)
+
+    # Virtual package related commands don't actually install or remove
+    # packages, but only mark the right ones as explicitly installed. They
+    # finish up almost instantly, so don't display a progress bar.
+    apk = ["apk", "--no-network"] if args.offline else ["apk"]
+    commands = ([apk + commands[0]] +
+                [apk + ["--no-progress"] + command for command in commands[1:]])
     for (i, command) in enumerate(commands):
-        if args.offline:
-            command = ["--no-network"] + command
         if i == 0:
-            pmb.helpers.apk.apk_with_progress(args, ["apk"] + command,
-                                              chroot=True, suffix=suffix)
+            pmb.helpers.apk.apk_with_progress(args, command, chroot=True,
+                                              suffix=suffix)
         else:
-            # Virtual package related commands don't actually install or remove
-            # packages, but only mark the right ones as explicitly installed.
-            # They finish up almost instantly, so don't display a progress bar.
-            pmb.chroot.root(args, ["apk", "--no-progress"] + command,
-                            suffix=suffix)
+            pmb.chroot.root(args, command, suffix=suffix)
+
+    # Installed packages changed, dependencies may resolve differently now.
+    # Drop the parsed installed db as well, so installed() doesn't rely on
+    # the mtime alone (which may not change on filesystems with a coarse
+    # timestamp resolution).
+    pmb.helpers.other.cache["depends_recurse"].pop(suffix, None)
+    pmb.parse.apkindex.clear_cache(installed_path(args, suffix))
+
+
+def installed_path(args, suffix="native"):
+    """ :returns: path to apk's database of installed packages """
+    return f"{args.work}/chroot_{suffix}/lib/apk/db/installed"
 
 
 def installed(args, suffix="native"):
     """
     Read the list of installed packages (which has almost the same format, as
-    an APKINDEX, but with more keys).
+    an APKINDEX, but with more keys). The parsed result is cached for the
+    session by pmb.parse.apkindex.parse(), and gets invalidated when the file
+    changes or install() ran apk.
 
     :returns: a dictionary with the following structure:
               { "postmarketos-mkinitfs":
@@ -276,5 +346,4 @@ def installed(args, suffix="native"):
                 }, ...
               }
     """
-    path = f"{args.work}/chroot_{suffix}/lib/apk/db/installed"
-    return pmb.parse.apkindex.parse(path, False)
+    return pmb.parse.apkindex.parse(installed_path(args, suffix), False)
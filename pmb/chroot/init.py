@@ -93,6 +93,9 @@ def init(args, suffix="native"):
 
     logging.info(f"({suffix}) install alpine-base")
 
+    # Resolved dependencies of a previous chroot are not valid anymore
+    pmb.helpers.other.cache["depends_recurse"].pop(suffix, None)
+
     # Initialize cache
     apk_cache = f"{args.work}/cache_apk_{arch}"
     pmb.helpers.run.root(args, ["ln", "-s", "-f", "/var/cache/apk",
@@ -303,7 +303,9 @@ def init_cache():
              "apk_min_version_checked": [],
              "apk_repository_list_updated": [],
              "built": {},
+             "depends_recurse": {},
              "find_aport": {},
+             "repo_urls": {},
              "pmb.helpers.package.depends_recurse": {},
              "pmb.helpers.package.get": {},
              "pmb.helpers.repo.update": repo_update,
@@ -186,6 +186,49 @@ def find(args, package, must_exist=True):
     return ret
 
 
+def all_pkgnames(args):
+    """
+    Map all pkgnames, subpackages and provides (with version) of pmaports to
+    their aport folders. This is faster than calling find() for many packages
+    that are not in pmaports, because find() would need to look through all
+    APKBUILDs again for each of them.
+
+    :returns: dict like: {"hello-world": "/.../pmaports/main/hello-world",
+                          "hello-world-doc": "/.../pmaports/main/hello-world",
+                          ...}
+    """
+    # Try to get a cached result first (we assume that the aports don't change
+    # in one pmbootstrap call)
+    ret = pmb.helpers.other.cache.get("pmb.helpers.pmaports.all_pkgnames")
+    if ret is not None:
+        return ret
+
+    ret = {}
+    apkbuilds = _find_apkbuilds(args)
+    for path in apkbuilds.values():
+        aport = os.path.dirname(path)
+        apkbuild = pmb.parse.apkbuild(path)
+        for subpkgname, subpkg in apkbuild["subpackages"].items():
+            ret.setdefault(subpkgname, aport)
+
+        # Provides (cut off before equals sign for entries like
+        # "mkbootimg=0.0.1", ignore provides without version like find())
+        for apkbuild_pkg in [apkbuild, *apkbuild["subpackages"].values()]:
+            if not apkbuild_pkg:
+                continue
+            for provides_i in apkbuild_pkg["provides"]:
+                if "=" in provides_i:
+                    ret.setdefault(provides_i.split("=", 1)[0], aport)
+
+    # Package names take precedence over subpackages and provides
+    for pkgname, path in apkbuilds.items():
+        ret[pkgname] = os.path.dirname(path)
+
+    # Save result in cache
+    pmb.helpers.other.cache["pmb.helpers.pmaports.all_pkgnames"] = ret
+    return ret
+
+
 def get(args, pkgname, must_exist=True, subpackages=True):
     """ Find and parse an APKBUILD file.
         Run 'pmbootstrap apkbuild_parse hello-world' for a full output example.
@@ -283,15 +283,34 @@ def providers(args, package, arch=None, must_exist=True, indexes=None):
         arch = arch or pmb.config.arch_native
         indexes = pmb.helpers.repo.apkindex_files(args, arch)
 
+    parsed = [(path, parse(path)) for path in indexes]
+    ret = providers_parsed(package, parsed)
+
+    if ret == {} and must_exist:
+        logging.debug("Searched in APKINDEX files: " + ", ".join(indexes))
+        raise RuntimeError("Could not find package '" + package + "'!")
+
+    return ret
+
+
+def providers_parsed(package, parsed):
+    """
+    Get all packages, which provide one package, from already parsed APKINDEX
+    files. Use providers() instead, unless you need to look up many packages
+    in the same APKINDEX files (see packages_bulk()).
+
+    :param package: of which you want to have the providers
+    :param parsed: list of (path, parse(path)) tuples, one per APKINDEX file
+    :returns: see providers()
+    """
     for operator in [">", ">=", "=", "<=", "<", "~"]:
         if operator in package:
             package = package.split(operator)[0]
             break
 
     ret = collections.OrderedDict()
-    for path in indexes:
+    for path, index_packages in parsed:
         # Skip indexes not providing the package
-        index_packages = parse(path)
         if package not in index_packages:
             continue
 
@@ -313,10 +332,6 @@ def providers(args, package, arch=None, must_exist=True, indexes=None):
                             "-" + version + " in " + path)
             ret[provider_pkgname] = provider
 
-    if ret == {} and must_exist:
-        logging.debug("Searched in APKINDEX files: " + ", ".join(indexes))
-        raise RuntimeError("Could not find package '" + package + "'!")
-
     return ret
 
 
@@ -384,15 +399,53 @@ def package(args, package, arch=None, must_exist=True, indexes=None):
     """
     # Provider with the same package
     package_providers = providers(args, package, arch, must_exist, indexes)
-    if package in package_providers:
-        return package_providers[package]
-
-    # Any provider
-    if package_providers:
-        return pmb.parse.apkindex.provider_shortest(package_providers, package)
+    ret = provider_package(package_providers, package)
 
     # No provider
-    if must_exist:
+    if not ret and must_exist:
         raise RuntimeError("Package '" + package + "' not found in any"
                            " APKINDEX.")
+    return ret
+
+
+def provider_package(providers, package):
+    """
+    Pick the provider that package() returns for a package.
+
+    :param providers: returned dict from providers(), may be empty
+    :param package: the package name we are interested in
+    :returns: the provider with the same pkgname, the shortest provider or
+              None when there are no providers.
+    """
+    # Provider with the same package
+    if package in providers:
+        return providers[package]
+
+    # Any provider
+    if providers:
+        return pmb.parse.apkindex.provider_shortest(providers, package)
+
     return None
+
+
+def packages_bulk(args, packages, arch=None):
+    """
+    Get the apkindex data of multiple packages at once. Same as calling
+    package() with must_exist=False for each package, but the APKINDEX files
+    are only looked up and parsed once.
+
+    :param packages: list of package names
+    :param arch: defaults to native arch
+    :returns: dict of package name to the return value of package(), e.g.:
+              { "postmarketos-mkinitfs": { "pkgname": ..., ... },
+                "package-that-does-not-exist": None }
+    """
+    arch = arch or pmb.config.arch_native
+    indexes = pmb.helpers.repo.apkindex_files(args, arch)
+    parsed = [(path, parse(path)) for path in indexes]
+
+    ret = {}
+    for package in packages:
+        ret[package] = provider_package(providers_parsed(package, parsed),
+                                        package)
+    return ret
@@ -126,11 +126,15 @@ def recurse(args, pkgnames, suffix="native"):
     todo = list(pkgnames)
     required_by = {}
     ret = []
+    ret_set = set()
+    visited = set()
     while len(todo):
-        # Skip already passed entries
+        # Skip already passed entries (resolve each depend only once, even if
+        # it is required by multiple packages)
         pkgname_depend = todo.pop(0)
-        if pkgname_depend in ret:
+        if pkgname_depend in visited or pkgname_depend in ret_set:
             continue
+        visited.add(pkgname_depend)
 
         # Check if the dependency is explicitly marked as conflicting
         is_conflict = pkgname_depend.startswith("!")
@@ -158,7 +162,7 @@ def recurse(args, pkgnames, suffix="native"):
             pkgname = f"!{pkgname}"
 
         # Append to todo/ret (unless it is a duplicate)
-        if pkgname in ret:
+        if pkgname in ret_set:
             logging.verbose(f"{pkgname}: already found")
         else:
             if not is_conflict:
@@ -171,4 +175,5 @@ def recurse(args, pkgnames, suffix="native"):
                             required_by[dep] = set()
                         required_by[dep].add(pkgname_depend)
             ret.append(pkgname)
+            ret_set.add(pkgname)
     return ret
@@ -4,7 +4,9 @@ import pytest
 import sys
 
 import pmb_test  # noqa
+import pmb.build
 import pmb.chroot.apk
+import pmb.helpers.run
 
 
 @pytest.fixture
@@ -30,3 +32,70 @@ def test_install_is_necessary(args):
                                               "!osk-sdl",
                                               {"osk-sdl": {"osk-sdl": {}}})
     assert ret
+
+
+def test_depends_recurse_cache(args, monkeypatch):
+    calls = []
+
+    def fake_recurse(args, packages, suffix="native"):
+        calls.append((list(packages), suffix))
+        return list(packages) + ["dep"]
+    monkeypatch.setattr(pmb.parse.depends, "recurse", fake_recurse)
+    func = pmb.chroot.apk.depends_recurse
+
+    # First call resolves, second call (other order) is served from cache
+    assert func(args, ["a", "b"], "native") == ["a", "b", "dep"]
+    assert func(args, ["b", "a"], "native") == ["a", "b", "dep"]
+    assert len(calls) == 1
+
+    # Different suffix: resolve again
+    func(args, ["a", "b"], "buildroot_armhf")
+    assert len(calls) == 2
+
+    # Invalidated suffix: resolve again
+    pmb.helpers.other.cache["depends_recurse"].pop("native")
+    func(args, ["a", "b"], "native")
+    assert len(calls) == 3
+
+
+def test_install_is_necessary_no_binary(args, monkeypatch):
+    # Binary package can't be found, not even after rebuilding it
+    builds = []
+    monkeypatch.setattr(pmb.parse.apkindex, "package",
+                        lambda *args, **kwargs: None)
+    monkeypatch.setattr(pmb.build, "package",
+                        lambda args, pkgname, arch, force=False:
+                        builds.append((pkgname, force)))
+
+    with pytest.raises(RuntimeError) as e:
+        pmb.chroot.apk.install_is_necessary(args, False, "aarch64", "osk-sdl",
+                                            {"osk-sdl": {}})
+    assert "even after rebuilding it" in str(e.value)
+    assert builds == [("osk-sdl", True)]
+
+
+def test_update_repository_list(args, monkeypatch, tmpdir):
+    args.work = str(tmpdir)
+    lines = ["/mnt/pmbootstrap-packages", "http://mirror/'quote' %s"]
+    monkeypatch.setattr(pmb.chroot.apk, "repository_list",
+                        lambda args: lines)
+
+    # Run commands as user instead of root
+    def run_root(args, cmd, *args_, **kwargs):
+        return pmb.helpers.run.user(args, cmd, *args_, **kwargs)
+    monkeypatch.setattr(pmb.helpers.run, "root", run_root)
+
+    # Create the file
+    func = pmb.chroot.apk.update_repository_list
+    path = f"{args.work}/chroot_native/etc/apk/repositories"
+    func(args)
+    with open(path) as handle:
+        assert handle.read() == "\n".join(lines) + "\n"
+    assert "native" in pmb.helpers.other.cache["apk_repository_list_updated"]
+
+    # Update outdated file
+    pmb.helpers.other.cache["apk_repository_list_updated"].clear()
+    lines = ["/mnt/pmbootstrap-packages"]
+    func(args)
+    with open(path) as handle:
+        assert handle.read() == "/mnt/pmbootstrap-packages\n"
@@ -5,7 +5,9 @@ import pytest
 import sys
 
 import pmb_test  # noqa
+import pmb_test.const
 import pmb.build.other
+import pmb.helpers.pmaports
 
 
 @pytest.fixture
@@ -50,3 +52,17 @@ def test_guess_main_dev(args, tmpdir):
     func = pmb.helpers.pmaports.guess_main
     assert func(args, "plasma-framework-dev") is None
     assert func(args, "plasma-randomsubpkg") == tmpdir + "/temp/plasma"
+
+
+def test_all_pkgnames(args):
+    aports = pmb_test.const.testdata + "/init_questions_device/aports"
+    args.aports = aports
+
+    aport = f"{aports}/device/testing/device-nonfree-firmware"
+    ret = pmb.helpers.pmaports.all_pkgnames(args)
+    assert ret["device-nonfree-firmware"] == aport
+    assert ret["device-nonfree-firmware-nonfree-firmware"] == aport
+    assert "invalid-package" not in ret
+
+    # Cached result
+    assert pmb.helpers.pmaports.all_pkgnames(args) is ret
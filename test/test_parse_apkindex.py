@@ -393,3 +393,28 @@ def test_package(args, monkeypatch):
 
     # No provider (without must_exist)
     assert func(args, pkgname, must_exist=False) is None
+
+
+def test_packages_bulk(args, monkeypatch):
+    # Fake APKINDEX files and parse function (count the calls)
+    parsed = []
+
+    def return_fake_parse(path):
+        parsed.append(path)
+        if path == "i0":
+            return {"test": {"test": {"pkgname": "test", "version": "1"}},
+                    "so:libtest.so.1": {"test": {"pkgname": "test",
+                                                 "version": "1"}}}
+        return {"test": {"test": {"pkgname": "test", "version": "2"}}}
+    monkeypatch.setattr(pmb.parse.apkindex, "parse", return_fake_parse)
+    monkeypatch.setattr(pmb.helpers.repo, "apkindex_files",
+                        lambda *args, **kwargs: ["i0", "i1"])
+
+    func = pmb.parse.apkindex.packages_bulk
+    ret = func(args, ["test", "so:libtest.so.1", "invalid"], "armhf")
+    assert ret == {"test": {"pkgname": "test", "version": "2"},
+                   "so:libtest.so.1": {"pkgname": "test", "version": "1"},
+                   "invalid": None}
+
+    # Each APKINDEX was only parsed once
+    assert parsed == ["i0", "i1"]
@@ -162,3 +162,26 @@ def test_recurse(args, monkeypatch):
     result = ["test", "so:libtest.so.1", "libtest", "libtest_depend",
               "!libtest_conflict"]
     assert func(args, pkgnames) == result
+
+
+def test_recurse_shared_depends(args, monkeypatch):
+    """
+    A depend that is required by multiple packages and provided by a package
+    with another name must only be resolved once.
+    """
+    monkeypatch.setattr(pmb.parse.depends, "package_from_aports",
+                        return_none)
+
+    resolved = []
+
+    def package_from_index(args, pkgname, install, aport, suffix):
+        resolved.append(pkgname)
+        if pkgname == "so:libx.so.1":
+            return {"pkgname": "libx", "depends": []}
+        return {"pkgname": pkgname, "depends": ["so:libx.so.1"]}
+    monkeypatch.setattr(pmb.parse.depends, "package_from_index",
+                        package_from_index)
+
+    func = pmb.parse.depends.recurse
+    assert func(args, ["a", "b"]) == ["a", "b", "libx"]
+    assert resolved == ["a", "b", "so:libx.so.1"]